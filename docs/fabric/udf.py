@@ -1,29 +1,41 @@
 import fabric.functions as fn
-import json
 import logging
+import time
+
+import orjson
 
 udf = fn.UserDataFunctions()
 
-def get_patient_id_map(lakehouseClient: fn.FabricLakehouseClient) -> dict:
+PATIENT_QUERY = """SELECT DISTINCT TOP 10 [id],[name_string]
+    FROM [healthcare1_msft_silver].[dbo].[Patient];"""
+
+# The patient list rarely changes, so the name to id map is reused across invocations for a short time.
+PATIENT_ID_MAP_TTL_SECONDS = 300
+_patient_id_map_cache = None
+_patient_id_map_expiry = 0.0
+
+def get_patient_id_map(connection) -> dict:
     """
-    Retrieves a list of patient IDs from the Lakehouse.
+    Retrieves a map of patient names to patient IDs using an open Lakehouse SQL connection.
     """
-    connection = lakehouseClient.connectToSql()
-    cursor = None
-    try:
-        patient_query = """SELECT DISTINCT TOP 10 [id],[name_string]
-            FROM [healthcare1_msft_silver].[dbo].[Patient];"""
+    global _patient_id_map_cache, _patient_id_map_expiry
+    if _patient_id_map_cache is not None and time.monotonic() < _patient_id_map_expiry:
+        return _patient_id_map_cache
 
-        cursor = connection.cursor()
-        cursor.execute(patient_query)
+    cursor = connection.cursor()
+    try:
+        cursor.execute(PATIENT_QUERY)
 
-        results = { json.loads(result[1])[0]['given'][0] : result[0] for result in cursor}
-        logging.info(json.dumps(results, indent=2))
+        results = { orjson.loads(result[1])[0]['given'][0] : result[0] for result in cursor.fetchall()}
+        logging.debug("patient id map size: %d", len(results))
+        _patient_id_map_cache = results
+        _patient_id_map_expiry = time.monotonic() + PATIENT_ID_MAP_TTL_SECONDS
         return results
+    except Exception:
+        _patient_id_map_cache = None
+        raise
     finally:
-        if cursor:
-            cursor.close()
-        connection.close()
+        cursor.close()
 
 @udf.connection(argName="myLakehouse", alias="FHIR")
 @udf.function()
@@ -34,13 +46,10 @@ def get_patients_by_id(myLakehouse: fn.FabricLakehouseClient) -> list:
     connection = myLakehouse.connectToSql()
     cursor = None
     try:
-        patient_query = """SELECT DISTINCT TOP 10 [id],[name_string]
-            FROM [healthcare1_msft_silver].[dbo].[Patient];"""
-
         cursor = connection.cursor()
-        cursor.execute(patient_query)
+        cursor.execute(PATIENT_QUERY)
 
-        patient_ids = [json.loads(result[1])[0]['given'][0] for result in cursor]
+        patient_ids = [orjson.loads(result[1])[0]['given'][0] for result in cursor.fetchall()]
         return {"ids": patient_ids}
     finally:
         if cursor:
@@ -56,30 +65,19 @@ def get_clinical_notes_by_patient_id(myLakehouse: fn.FabricLakehouseClient, pati
     connection = myLakehouse.connectToSql()
     cursor = None
     try:
-        patient_id_map = get_patient_id_map(myLakehouse)
+        patient_id_map = get_patient_id_map(connection)
         resolved_patient_id = patient_id_map[patientId] if patientId in patient_id_map else patientId
 
         logging.info(f"resolved patient id: {resolved_patient_id}")
-        document_reference_query = f"""SELECT TOP 1000 [id],[subject_string]
-            FROM [healthcare1_msft_silver].[dbo].[DocumentReference];"""
+        # Filter on the subject reference server-side so only matching note ids are returned.
+        document_reference_query = """SELECT TOP 1000 [id]
+            FROM [healthcare1_msft_silver].[dbo].[DocumentReference]
+            WHERE JSON_VALUE([subject_string], '$.id') IN (?, ?);"""
         cursor = connection.cursor()
-        cursor.execute(document_reference_query)
-
-        note_data = []
-        for row in cursor:
-            try:
-                note_data.append({"id": row[0], "subject": json.loads(row[1])})
-            except Exception as e:
-                logging.error(e)
+        cursor.execute(document_reference_query, (resolved_patient_id, f"Patient/{resolved_patient_id}"))
 
-        logging.info(f"Valid note datas: {len(note_data)}")
-
-        retrieved_notes = []
-        for note in note_data:
-            logging.info(json.dumps(note_data, indent=2))
-            note_subject = note["subject"]["id"].split("/")[-1]
-            if note_subject == resolved_patient_id:
-                retrieved_notes.append(note["id"])
+        retrieved_notes = [row[0] for row in cursor.fetchall()]
+        logging.info(f"Retrieved notes: {len(retrieved_notes)}")
 
         return retrieved_notes
     finally:
@@ -96,21 +94,21 @@ def get_clinical_note_by_patient_id(myLakehouse: fn.FabricLakehouseClient, noteI
     connection = myLakehouse.connectToSql()
     cursor = None
     try:
-        query = f"""SELECT [id],[content_string],[subject_string]
-            FROM [healthcare1_msft_silver].[dbo].[DocumentReference] WHERE id = '{noteId}';"""
+        query = """SELECT TOP 1 [id],[content_string],[subject_string]
+            FROM [healthcare1_msft_silver].[dbo].[DocumentReference] WHERE id = ?;"""
         cursor = connection.cursor()
-        cursor.execute(query)
-
-        note_data = []
-        for row in cursor:
-            try:
-                note_data.append({"id": row[0], "content": json.loads(row[1])})
-            except Exception as e:
-                logging.error(e)
-
-        logging.info(f"Valid note datas: {len(note_data)}")
-
-        return {"content": note_data[0]["content"]}if len(note_data) > 0 else {}
+        cursor.execute(query, (noteId,))
+
+        row = cursor.fetchone()
+        if row is None:
+            logging.info(f"Note not found: {noteId}")
+            return {}
+
+        try:
+            return {"content": orjson.loads(row[1])}
+        except Exception as e:
+            logging.error(e)
+            return {}
 
     finally:
         if cursor:
@@ -1,11 +1,15 @@
 import base64
+import functools
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
 from uuid import uuid4
 
 import argparse
 
+NDJSON_WRITE_BUFFER_SIZE = 1024 * 1024
+
 def create_patient_resource(patient_folder: str):
     return {
         "resourceType": "Patient",
@@ -62,18 +66,66 @@ def add_last_updated_to_patient(patient):
     return patient
 
 
+@functools.cache
 def create_last_updated_formatted_date():
     """
     Returns yesterday's date in the format: YYYY-MM-DDTHH:MM:SS.sss+00:00
+    The value is computed once per process so the resources generated by a worker share the same timestamp.
     """
     dt = datetime.now(timezone.utc) - timedelta(days=1)
     return dt.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "+00:00"
 
 def write_ndjson_file(file_path, resources):
     """Write a list of resources to a file in NDJSON format."""
-    with open(file_path, "w") as f:
-        for resource in resources:
-            f.write(json.dumps(resource) + "\n")
+    with open(file_path, "w", buffering=NDJSON_WRITE_BUFFER_SIZE) as f:
+        f.writelines(f"{json.dumps(resource)}\n" for resource in resources)
+
+
+def process_patient_folder(
+        patient_folder: str,
+        patient_input_dir: str,
+        patient_files_dir: str,
+        document_reference_files_dir: str,
+        fabric: bool):
+    """
+    Generates the Patient and DocumentReference resources for a single patient folder.
+    Resources are written to individual files, or returned to the caller when generating NDJSON for Fabric.
+    """
+    patients = []
+    document_references = []
+
+    patient_resource = create_patient_resource(patient_folder)
+    patient_resource = add_last_updated_to_patient(patient_resource)
+    fhir_patient_id = patient_resource["id"]
+
+    if fabric:
+        patients.append(patient_resource)
+    else:
+        patient_file_path = os.path.join(patient_files_dir, f"{patient_folder}.json")
+        with open(patient_file_path, "w") as patient_file:
+            patient_file.write(json.dumps(patient_resource) + "\n")
+
+    clinical_notes_dir = os.path.join(patient_input_dir, patient_folder, "clinical_notes")
+    if os.path.exists(clinical_notes_dir):
+        with os.scandir(clinical_notes_dir) as clinical_note_entries:
+            clinical_notes = [entry for entry in clinical_note_entries if entry.is_file()]
+        for clinical_note_entry in clinical_notes:
+            clinical_note = clinical_note_entry.name
+            with open(clinical_note_entry.path, "rb") as f:
+                note_json = json.load(f)
+            note_id = clinical_note.split(".")[0]
+            document_reference_resource = create_document_reference(
+                fhir_patient_id, note_id, json.dumps(note_json))
+            document_reference_resource = add_last_updated_to_document_reference(document_reference_resource)
+            if fabric:
+                document_references.append(document_reference_resource)
+            else:
+                document_reference_file_path = os.path.join(document_reference_files_dir, clinical_note)
+                with open(document_reference_file_path, "w") as document_reference_file:
+                    document_reference_file.write(json.dumps(document_reference_resource) + "\n")
+
+    return patients, document_references
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate FHIR resources as NDJSON or individual files.")
@@ -86,47 +138,30 @@ if __name__ == "__main__":
     patient_output_dir = os.path.join(os.getcwd(), output_dir)
     document_reference_output_dir = os.path.join(os.getcwd(), output_dir)
 
-    patient_data_items = os.listdir(patient_input_dir)
-
     all_patients = []
     all_document_references = []
 
-    for patient_folder in patient_data_items:
-        folder_path = os.path.join(patient_input_dir, patient_folder)
-        if os.path.isdir(folder_path):
-            patient_resource = create_patient_resource(patient_folder)
-            patient_resource = add_last_updated_to_patient(patient_resource)
-            fhir_patient_id = patient_resource["id"]
-
-            if args.fabric:
-                all_patients.append(patient_resource)
-            else:
-                patient_file_name = os.path.join("patients", f"{patient_folder}.json")
-                patient_file_path = os.path.join(patient_output_dir, patient_file_name)
-                os.makedirs(os.path.dirname(patient_file_path), exist_ok=True)
-                with open(patient_file_path, "w") as patient_file:
-                    patient_file.write(json.dumps(patient_resource) + "\n")
-
-            clinical_notes_dir = os.path.join(patient_input_dir, patient_folder, "clinical_notes")
-            if os.path.exists(clinical_notes_dir):
-                clinical_notes = os.listdir(clinical_notes_dir)
-                for clinical_note in clinical_notes:
-                    clinical_note_file = os.path.join(clinical_notes_dir, clinical_note)
-                    with open(clinical_note_file, "r") as f:
-                        note = f.read()
-                        note_json = json.loads(note)
-                        note_id = os.path.basename(clinical_note_file).split(".")[0]
-                        document_reference_resource = create_document_reference(
-                            fhir_patient_id, note_id, json.dumps(note_json))
-                        document_reference_resource = add_last_updated_to_document_reference(document_reference_resource)
-                        if args.fabric:
-                            all_document_references.append(document_reference_resource)
-                        else:
-                            document_reference_file_name = os.path.join("document_references", clinical_note)
-                            document_reference_file_path = os.path.join(document_reference_output_dir, document_reference_file_name)
-                            os.makedirs(os.path.dirname(document_reference_file_path), exist_ok=True)
-                            with open(document_reference_file_path, "w") as document_reference_file:
-                                document_reference_file.write(json.dumps(document_reference_resource) + "\n")
+    # Create the per-resource output folders once instead of once per written file
+    patient_files_dir = os.path.join(patient_output_dir, "patients")
+    document_reference_files_dir = os.path.join(document_reference_output_dir, "document_references")
+    if not args.fabric:
+        os.makedirs(patient_files_dir, exist_ok=True)
+        os.makedirs(document_reference_files_dir, exist_ok=True)
+
+    with os.scandir(patient_input_dir) as patient_data_items:
+        patient_folders = [entry.name for entry in patient_data_items if entry.is_dir()]
+
+    # Patient folders are independent, so they are processed in parallel. Each worker writes its own files.
+    process_folder = functools.partial(
+        process_patient_folder,
+        patient_input_dir=patient_input_dir,
+        patient_files_dir=patient_files_dir,
+        document_reference_files_dir=document_reference_files_dir,
+        fabric=args.fabric)
+    with ProcessPoolExecutor() as executor:
+        for patients, document_references in executor.map(process_folder, patient_folders):
+            all_patients.extend(patients)
+            all_document_references.extend(document_references)
 
     # If --fabric, write NDJSON files
     if args.fabric:
@@ -1,30 +1,122 @@
 import argparse
+import functools
+import http.client
 import json
 import logging
 import os
 import re
+import threading
+import time
+import urllib.parse
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Callable
 
+# Throttling is retried for every method; server errors only for GET, since a POST may already have been processed
+THROTTLED_STATUS_CODE = 429
+RETRY_STATUS_CODES = {500, 502, 503, 504}
+
+# Keep-alive connections, one per host for each thread that sends requests
+_thread_connections = threading.local()
+
+
+def get_connection(scheme: str, netloc: str) -> http.client.HTTPConnection:
+    """
+    Returns the calling thread's persistent connection to the given host, creating it if needed.
+    Honours the HTTPS_PROXY/HTTP_PROXY and NO_PROXY environment variables, like urllib.request.urlopen.
+    """
+    connections = getattr(_thread_connections, "connections", None)
+    if connections is None:
+        connections = _thread_connections.connections = {}
+    key = (scheme, netloc)
+    if key not in connections:
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        proxy = urllib.request.getproxies().get(scheme)
+        if proxy and not urllib.request.proxy_bypass(netloc):
+            # Connect to the proxy and tunnel through it to the target host
+            connection = connection_class(urllib.parse.urlsplit(proxy).netloc, timeout=60)
+            connection.set_tunnel(netloc)
+        else:
+            connection = connection_class(netloc, timeout=60)
+        connections[key] = connection
+    return connections[key]
+
+
+def get_retry_after_seconds(response: http.client.HTTPResponse) -> float:
+    """
+    Returns the delay requested by the server's Retry-After header (in seconds), or 0 if there is none.
+    """
+    retry_after = response.getheader("Retry-After", "")
+    return int(retry_after) if retry_after.isdigit() else 0
+
+
+def send_request(
+        method: str,
+        url: str,
+        headers: dict,
+        body: bytes = None,
+        max_retries: int = 5,
+        backoff_factor: float = 1.0) -> tuple[int, bytes]:
+    """
+    Sends a request over a reused keep-alive connection.
+
+    Throttled (429) requests are retried for every method, honouring Retry-After, and server errors only
+    for GET. A request is resent after a connection failure only if the server cannot have processed it.
+    :return: The response status code and body.
+    """
+    parsed_url = urllib.parse.urlsplit(url)
+    path = urllib.parse.urlunsplit(("", "", parsed_url.path or "/", parsed_url.query, ""))
+    key = (parsed_url.scheme, parsed_url.netloc)
+
+    for attempt in range(max_retries + 1):
+        connection = get_connection(*key)
+        reused_connection = connection.sock is not None
+        delay = backoff_factor * (2 ** attempt)
+        request_sent = False
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            request_sent = True
+            response = connection.getresponse()
+            response_body = response.read()
+        except (http.client.HTTPException, OSError) as e:
+            # Drop the broken connection so the next attempt reconnects
+            connection.close()
+            del _thread_connections.connections[key]
+            # A kept-alive connection closed by the server before it answered was stale, so it is safe to resend
+            stale_connection = reused_connection and isinstance(e, http.client.RemoteDisconnected)
+            if attempt == max_retries or (request_sent and method != "GET" and not stale_connection):
+                raise
+        else:
+            retry = (response.status == THROTTLED_STATUS_CODE
+                     or (method == "GET" and response.status in RETRY_STATUS_CODES))
+            if not retry or attempt == max_retries:
+                return response.status, response_body
+            delay = max(delay, get_retry_after_seconds(response))
+        time.sleep(delay)
+
+
+def get_headers(auth_token: str) -> dict:
+    """
+    Returns the headers required for FHIR API requests.
+    """
+    return {
+        "Authorization": f"Bearer {auth_token}",
+        "Content-Type": "application/json"
+    }
+
 
 def post_fhir_resource_batch(fhir_url: str, resource_batch: Any, auth_token: str) -> Any:
     """
     Posts a batch of resources to the FHIR server.
     :param resource_batch: A bundle of resources to post."""
     url = f"{fhir_url}"
-    headers = {
-        "Authorization": f"Bearer {auth_token}",
-        "Content-Type": "application/json"
-    }
+    headers = get_headers(auth_token)
     data = json.dumps(resource_batch).encode('utf-8')
-    request = urllib.request.Request(url, data=data, headers=headers, method="POST")
-    with urllib.request.urlopen(request) as response:
-        if response.status != 200:
-            raise Exception(f"Failed to post resources to {url}. Status code: {response.status}")
+    status, response_body = send_request("POST", url, headers, data)
+    if status != 200:
+        raise Exception(f"Failed to post resources to {url}. Status code: {status}")
 
-        # Read response data
-        response_body = response.read().decode('utf-8')
-        return json.loads(response_body)
+    return json.loads(response_body)
 
 
 def load_resources(path):
@@ -34,46 +126,52 @@ def load_resources(path):
     """
     # ndjson file case
     if os.path.isfile(path):
-        with open(path, "r") as file:
+        with open(path, "rb") as file:
             for line in file:
-                yield json.loads(line.strip())
+                yield json.loads(line)
     # Single file per resource case
     elif os.path.isdir(path):
-        for file_name in os.listdir(path):
-            file_path = os.path.join(path, file_name)
-            if os.path.isfile(file_path):
-                with open(file_path, "r") as file:
-                    yield json.loads(file.read())
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    with open(entry.path, "rb") as file:
+                        yield json.load(file)
     else:
         raise ValueError(f"Invalid path: {path}")
 
 
-def patient_with_given_name_exists(
-        fhir_url: str,
-        auth_token: str,
-        resource: dict) -> bool:
+def get_existing_patient_names(fhir_url: str, auth_token: str) -> set:
     """
-    Checks to see if a patient with the same name already exists in the FHIR server.
+    Fetches the given names of all patients that already exist in the FHIR server.
     """
-    patient_name = resource['name'][0]['given'][0]
-    url = f"{fhir_url}/Patient?name={patient_name}"
-    headers = {
-        "Authorization": f"Bearer {auth_token}",
-        "Content-Type": "application/json"
-    }
-    request = urllib.request.Request(url, headers=headers)
+    url = f"{fhir_url}/Patient?_elements=name&_count=1000"
+    headers = get_headers(auth_token)
+    names = set()
+    while url:
+        status, response_body = send_request("GET", url, headers)
+        if status != 200:
+            raise Exception(f"Failed to fetch data from {url}. Status code: {status}")
+
+        data = json.loads(response_body)
 
-    with urllib.request.urlopen(request) as response:
-        if response.status != 200:
-            raise Exception(f"Failed to fetch data from {url}. Status code: {response.status}")
+        for entry in data.get("entry", []):
+            patient_names = entry["resource"].get("name", [])
+            if patient_names and patient_names[0].get("given"):
+                names.add(patient_names[0]["given"][0])
 
-        # Read patient data
-        data_str = response.read().decode('utf-8')
-        data = json.loads(data_str)
-        patients = data.get("entry", [])
+        url = next((link["url"] for link in data.get("link", []) if link.get("relation") == "next"), None)
+    return names
 
-    filtered_patients = [p for p in patients if p["resource"]['name'][0]['given'][0] == patient_name]
-    return len(filtered_patients) > 0
+
+def create_batch_request() -> dict:
+    """
+    Creates an empty FHIR batch bundle.
+    """
+    return {
+        "resourceType": "Bundle",
+        "type": "batch",
+        "entry": []
+    }
 
 
 def post_resources_in_batches(
@@ -84,81 +182,85 @@ def post_resources_in_batches(
         id_map: dict = {},
         batch_size: int = 10,
         resource_exists_fn: Callable[[dict], bool] = None,
-        id_map_required: bool = False):
+        id_map_required: bool = False,
+        max_concurrency: int = 8):
     """
     Posts resources in batches to the FHIR server.
     :param file_path: Path to a file or folder containing resources.
     :param resource_type: The type of resource to post.
     :param get_access_token: A couroutine to get an access token.
-    :param batch_size: The number of resources to post in each batch."""
+    :param batch_size: The number of resources to post in each batch.
+    :param max_concurrency: The maximum number of batches posted concurrently."""
     if os.path.exists(file_path):
-        batch_request = {
-            "resourceType": "Bundle",
-            "type": "batch",
-            "entry": []
-        }
+        batch_request = create_batch_request()
         print(f"Posting {resource_type} resources in batches of {batch_size}...")
         count = 0
         total = 0
-        responses = []
-        for resource in load_resources(file_path):
-            print(f"Processing resource type {resource['resourceType']} with id: {resource['id']}")
-            found_id = False
-            if "subject" in resource and "reference" in resource["subject"]:
-                current_id = resource["subject"]["reference"].split("/")[1]
-                if current_id in id_map:
-                    found_id = True
-                    new_id = id_map[current_id]
-                    resource["subject"]["reference"] = f"Patient/{new_id}"
-
-            # Resource was found in the id_map or does not require id_map
-            should_include = ((not id_map_required and len(id_map) == 0) or found_id)
-
-            # Check if the resource already exists in the FHIR server
-            if should_include and resource_exists_fn is not None:
-                exists = resource_exists_fn(resource)
-                if exists:
-                    print(f"{resource_type} resource with id {resource['id']} already exists. Skipping.")
-                    continue
-
-            if should_include:
-                batch_request["entry"].append({
-                    "resource": resource,
-                    "request": {
-                        "method": "POST",
-                        "url": resource_type
-                    }
-                })
-                count += 1
-                total += 1
-                # If batch size is reached, post the batch and reset
-                if count == batch_size:
-                    response = post_fhir_resource_batch(fhir_url, batch_request, auth_token)
-                    responses.append([batch_request, response])
-                    print(f"Posted batch of {batch_size} {resource_type} resources.")
-                    batch_request["entry"] = []  # Reset the batch
-                    count = 0
-            else:
-                print(
-                    f"Skipping {resource_type} resource with id {resource['id']} as it does not match the id_map or already exists on the server.")
-
-        # Post any remaining resources in the last batch
-        if batch_request["entry"] and (len(id_map) == 0 or found_id):
-            response = post_fhir_resource_batch(fhir_url, batch_request, auth_token)
-            responses.append([batch_request, response])
-            print(f"Posted final batch of {len(batch_request['entry'])} {resource_type} resources.")
+        pending = []
+        get_new_id = id_map.get
+        # Every entry posts the same request, so a single request dict is shared by all entries
+        entry_request = {
+            "method": "POST",
+            "url": resource_type
+        }
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            for resource in load_resources(file_path):
+                print(f"Processing resource type {resource['resourceType']} with id: {resource['id']}")
+                found_id = False
+                subject = resource.get("subject")
+                if subject and "reference" in subject:
+                    new_id = get_new_id(subject["reference"].removeprefix("Patient/"))
+                    if new_id is not None:
+                        found_id = True
+                        subject["reference"] = f"Patient/{new_id}"
+
+                # Resource was found in the id_map or does not require id_map
+                should_include = ((not id_map_required and not id_map) or found_id)
+
+                # Check if the resource already exists in the FHIR server
+                if should_include and resource_exists_fn is not None:
+                    exists = resource_exists_fn(resource)
+                    if exists:
+                        print(f"{resource_type} resource with id {resource['id']} already exists. Skipping.")
+                        continue
+
+                if should_include:
+                    batch_request["entry"].append({
+                        "resource": resource,
+                        "request": entry_request
+                    })
+                    count += 1
+                    total += 1
+                    # If batch size is reached, post the batch in the background and start a new one
+                    if count == batch_size:
+                        future = executor.submit(post_fhir_resource_batch, fhir_url, batch_request, auth_token)
+                        pending.append((batch_request, future))
+                        batch_request = create_batch_request()
+                        count = 0
+                else:
+                    print(
+                        f"Skipping {resource_type} resource with id {resource['id']} as it does not match the id_map or already exists on the server.")
+
+            # Post any remaining resources in the last batch. Entries were already filtered when they were added.
+            if batch_request["entry"]:
+                future = executor.submit(post_fhir_resource_batch, fhir_url, batch_request, auth_token)
+                pending.append((batch_request, future))
+
+            # Collect responses in submission order so they line up with their batch requests
+            responses = []
+            for batch_request, future in pending:
+                responses.append([batch_request, future.result()])
+                print(f"Posted batch of {len(batch_request['entry'])} {resource_type} resources.")
         print(f"Created a total of {total} {resource_type} resources.")
         return responses
 
 
 def create_patient_id_map(batch_responses):
-    id_map = {}
-    for batch_request, batch_response in batch_responses:
-        for i in range(len(batch_request['entry'])):
-            request_resource = batch_request['entry'][i]['resource']
-            response_resource = batch_response['entry'][i]['resource']
-            id_map[request_resource["id"]] = response_resource["id"]
-    return id_map
+    return {
+        request_entry['resource']["id"]: response_entry['resource']["id"]
+        for batch_request, batch_response in batch_responses
+        for request_entry, response_entry in zip(batch_request['entry'], batch_response['entry'])
+    }
 
 
 def is_default_fhir_url(fhir_url: str, formatted_env_name: str) -> bool:
@@ -176,13 +278,18 @@ def is_default_fhir_url(fhir_url: str, formatted_env_name: str) -> bool:
     if not formatted_env_name:
         return False
 
-    # Build the regex pattern
-    pattern = (
+    return get_default_fhir_url_pattern(formatted_env_name).match(fhir_url) is not None
+
+
+@functools.lru_cache(maxsize=4)
+def get_default_fhir_url_pattern(formatted_env_name: str) -> re.Pattern:
+    """
+    Compiles the default FHIR endpoint pattern for an environment name once and reuses it.
+    """
+    return re.compile(
         rf"^https://ahds{re.escape(formatted_env_name)}([a-zA-Z0-9]+)-fhir{re.escape(formatted_env_name)}\1\.fhir\.azurehealthcareapis\.com/?$"
     )
 
-    return re.match(pattern, fhir_url) is not None
-
 
 def main(auth_token: str, azure_env_name: str, fhir_url: str):
     # Check if the fhir_url is the default deployed Azure Health Data Services FHIR endpoint
@@ -198,12 +305,13 @@ def main(auth_token: str, azure_env_name: str, fhir_url: str):
     document_reference_file_path = os.path.join(root_folder, "document_references")
 
     try:
+        existing_patient_names = get_existing_patient_names(fhir_url, auth_token)
         responses = post_resources_in_batches(
             patient_file_path,
             fhir_url,
             "Patient",
             auth_token,
-            resource_exists_fn=lambda r: patient_with_given_name_exists(fhir_url, auth_token, r))
+            resource_exists_fn=lambda r: r['name'][0]['given'][0] in existing_patient_names)
 
         id_map = create_patient_id_map(responses)
 
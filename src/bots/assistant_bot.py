@@ -4,6 +4,7 @@
 import asyncio
 import logging
 import os
+import re
 
 from botbuilder.core import MessageFactory, TurnContext
 from botbuilder.core.teams import TeamsActivityHandler
@@ -18,6 +19,8 @@ from group_chat import create_group_chat
 
 logger = logging.getLogger(__name__)
 
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 
 class AssistantBot(TeamsActivityHandler):
     def __init__(
@@ -34,7 +37,7 @@ class AssistantBot(TeamsActivityHandler):
         self.adapters = adapters
         self.adapters[self.name].on_turn_error = self.on_error  # add error handling
         self.data_access = app_context.data_access
-        self.root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.root_dir = _ROOT_DIR
 
     async def get_bot_context(
         self, conversation_id: str, bot_name: str, turn_context: TurnContext
@@ -50,9 +53,7 @@ class AssistantBot(TeamsActivityHandler):
         return self.turn_contexts[conversation_id][bot_name]
 
     async def create_turn_context(self, bot_name, turn_context):
-        app_id = next(
-            agent["bot_id"] for agent in self.all_agents if agent["name"] == bot_name
-        )
+        app_id = self.app_context.agent_configs_by_name[bot_name]["bot_id"]
 
         # Lookup adapter for bot_name. bot_name maybe different from self.name.
         adapter = self.adapters[bot_name]
@@ -62,13 +63,14 @@ class AssistantBot(TeamsActivityHandler):
                 claims_identity
             )
         )
-        connector_client = await connector_factory.create(
-            turn_context.activity.service_url, "https://api.botframework.com"
-        )
-        user_token_client = (
-            await adapter.bot_framework_authentication.create_user_token_client(
+        # The connector and user token clients are independent, so create them concurrently.
+        connector_client, user_token_client = await asyncio.gather(
+            connector_factory.create(
+                turn_context.activity.service_url, "https://api.botframework.com"
+            ),
+            adapter.bot_framework_authentication.create_user_token_client(
                 claims_identity
-            )
+            ),
         )
 
         async def logic(context: TurnContext):
@@ -101,29 +103,39 @@ class AssistantBot(TeamsActivityHandler):
             await turn_context.send_activity("Conversation cleared!")
             return
         agents = self.all_agents
-        if len(chat_ctx.chat_history.messages) == 0:
+        if not chat_ctx.chat_history.messages:
             # new conversation. Let's see which agents are available.
+            conversation_reference = turn_context.activity.get_conversation_reference()
+
             async def is_part_of_conversation(agent):
-                context = await self.get_bot_context(turn_context.activity.conversation.id, agent["name"], turn_context)
+                context = await self.get_bot_context(conversation_id, agent["name"], turn_context)
                 typing_activity = Activity(
                     type=ActivityTypes.typing,
                     relates_to=turn_context.activity.relates_to,
                 )
-                typing_activity.apply_conversation_reference(
-                    turn_context.activity.get_conversation_reference()
-                )
+                typing_activity.apply_conversation_reference(conversation_reference)
                 context.activity = typing_activity
                 try:
                     await context.send_activity(typing_activity)
                     return True
                 except Exception as e:
-                    logger.info(f"Failed to send typing activity to {agent['name']}: {e}")
+                    logger.info("Failed to send typing activity to %s: %s", agent["name"], e)
                     # This happens if the agent is not part of the group chat.
                     # Remove the agent from the list of available agents
                     return False
 
-            part_of_conversation = await asyncio.gather(*(is_part_of_conversation(agent) for agent in self.all_agents))
-            agents = [agent for agent, should_include in zip(self.all_agents, part_of_conversation) if should_include]
+            # A failure to build one agent's context must not fail the whole turn; log it and leave the agent out.
+            part_of_conversation = await asyncio.gather(
+                *(is_part_of_conversation(agent) for agent in self.all_agents), return_exceptions=True)
+            agents = []
+            for agent, result in zip(self.all_agents, part_of_conversation):
+                if isinstance(result, asyncio.CancelledError):
+                    raise result
+                if isinstance(result, BaseException):
+                    logger.warning("Failed to check whether %s is part of the conversation, excluding it.",
+                                   agent["name"], exc_info=result)
+                elif result:
+                    agents.append(agent)
 
         (chat, chat_ctx) = create_group_chat(self.app_context, chat_ctx, participants=agents)
 
@@ -158,30 +170,44 @@ class AssistantBot(TeamsActivityHandler):
     ):
         # If the mentioned agent is a facilitator, proceed with group chat.
         # Otherwise, proceed with standalone chat using the mentioned agent.
-        agent_config = next(agent_config for agent_config in self.all_agents if agent_config["name"] == self.name)
+        agent_config = self.app_context.agent_configs_by_name[self.name]
         mentioned_agent = None if agent_config.get("facilitator", False) \
             else next(agent for agent in chat.agents if agent.name == self.name)
 
-        async for response in chat.invoke(agent=mentioned_agent):
-            context = await self.get_bot_context(
-                turn_context.activity.conversation.id, response.name, turn_context
-            )
-            if response.content.strip() == "":
-                continue
-
-            msgText = self._append_links_to_msg(response.content, chat_ctx)
-            msgText = await self.generate_sas_for_blob_urls(msgText, chat_ctx)
-
-            activity = MessageFactory.text(msgText)
-            activity.apply_conversation_reference(
-                turn_context.activity.get_conversation_reference()
-            )
-            context.activity = activity
-
-            await context.send_activity(activity)
+        conversation_id = turn_context.activity.conversation.id
+        conversation_reference = turn_context.activity.get_conversation_reference()
 
-            if chat.is_complete:
-                break
+        # Each response is sent in the background while the next one is produced.
+        # Only one send is in flight at a time so messages keep their order.
+        pending_send = None
+        try:
+            async for response in chat.invoke(agent=mentioned_agent):
+                context = await self.get_bot_context(conversation_id, response.name, turn_context)
+                if response.content.strip() == "":
+                    continue
+
+                msgText = self._append_links_to_msg(response.content, chat_ctx)
+                msgText = await self.generate_sas_for_blob_urls(msgText, chat_ctx)
+
+                activity = MessageFactory.text(msgText)
+                activity.apply_conversation_reference(conversation_reference)
+
+                if pending_send is not None:
+                    await pending_send
+                context.activity = activity
+                pending_send = asyncio.create_task(context.send_activity(activity))
+
+                if chat.is_complete:
+                    break
+        except BaseException:
+            # Let the last send finish, but do not let its failure mask the chat error.
+            if pending_send is not None:
+                send_result, = await asyncio.gather(pending_send, return_exceptions=True)
+                if isinstance(send_result, BaseException):
+                    logger.warning("Failed to send a response while handling a chat error.", exc_info=send_result)
+            raise
+        if pending_send is not None:
+            await pending_send
 
     def _append_links_to_msg(self, msgText: str, chat_ctx: ChatContext) -> str:
         # Add patient data links to response
@@ -189,31 +215,44 @@ class AssistantBot(TeamsActivityHandler):
             image_urls = chat_ctx.display_image_urls
             clinical_trial_urls = chat_ctx.display_clinical_trials
 
+            if not image_urls and not clinical_trial_urls:
+                return msgText
+
+            parts = [msgText]
+
             # Display loaded images
             if image_urls:
-                msgText += "<h2>Patient Images</h2>"
+                parts.append("<h2>Patient Images</h2>")
                 for url in image_urls:
-                    filename = url.split("/")[-1]
-                    msgText += f"<img src='{url}' alt='{filename}' height='300px'/>"
+                    filename = url.rsplit("/", 1)[-1]
+                    parts.append(f"<img src='{url}' alt='{filename}' height='300px'/>")
 
             # Display clinical trials
             if clinical_trial_urls:
-                msgText += "<h2>Clinical trials</h2>"
+                parts.append("<h2>Clinical trials</h2>")
                 for url in clinical_trial_urls:
-                    trial = url.split("/")[-1]
-                    msgText += f"<li><a href='{url}'>{trial}</a></li>"
+                    trial = url.rsplit("/", 1)[-1]
+                    parts.append(f"<li><a href='{url}'>{trial}</a></li>")
 
-            return msgText
+            return "".join(parts)
         finally:
-            chat_ctx.display_image_urls = []
-            chat_ctx.display_clinical_trials = []
+            chat_ctx.display_image_urls.clear()
+            chat_ctx.display_clinical_trials.clear()
 
     async def generate_sas_for_blob_urls(self, msgText: str, chat_ctx: ChatContext) -> str:
         try:
-            for blob_url in chat_ctx.display_blob_urls:
-                blob_sas_url = await self.data_access.blob_sas_delegate.get_blob_sas_url(blob_url)
-                msgText = msgText.replace(blob_url, blob_sas_url)
-
-            return msgText
+            blob_urls = chat_ctx.display_blob_urls
+            if not blob_urls:
+                return msgText
+
+            blob_sas_urls = await asyncio.gather(
+                *(self.data_access.blob_sas_delegate.get_blob_sas_url(blob_url) for blob_url in blob_urls))
+            sas_url_by_blob_url = dict(zip(blob_urls, blob_sas_urls))
+
+            # Replace all blob URLs in a single pass. Longer URLs go first so a URL that is
+            # a prefix of another does not shadow it, and a SAS URL is never rewritten again.
+            pattern = re.compile("|".join(
+                re.escape(blob_url) for blob_url in sorted(sas_url_by_blob_url, key=len, reverse=True)))
+            return pattern.sub(lambda match: sas_url_by_blob_url[match.group(0)], msgText)
         finally:
-            chat_ctx.display_blob_urls = []
+            chat_ctx.display_blob_urls.clear()
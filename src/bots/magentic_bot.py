@@ -20,6 +20,8 @@ from magentic_chat import create_magentic_chat
 
 logger = logging.getLogger(__name__)
 
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 
 class MagenticBot(ActivityHandler):
     """
@@ -45,7 +47,7 @@ class MagenticBot(ActivityHandler):
         self.turn_contexts = turn_contexts
         self.data_access = app_context.data_access
         self.container_client = self.data_access.chat_context_accessor.container_client
-        self.root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.root_dir = _ROOT_DIR
         self.include_monologue = True
 
     async def on_message_activity(self, turn_context: TurnContext) -> None:
@@ -154,9 +156,7 @@ class MagenticBot(ActivityHandler):
         return user_input_func
 
     async def create_turn_context(self, bot_name, turn_context):
-        app_id = next(
-            agent["bot_id"] for agent in self.all_agents if agent["name"] == bot_name
-        )
+        app_id = self.app_context.agent_configs_by_name[bot_name]["bot_id"]
 
         # Lookup adapter for bot_name. bot_name maybe different from self.name.
         adapter = self.adapters[bot_name]
@@ -166,13 +166,14 @@ class MagenticBot(ActivityHandler):
                 claims_identity
             )
         )
-        connector_client = await connector_factory.create(
-            turn_context.activity.service_url, "https://api.botframework.com"
-        )
-        user_token_client = (
-            await adapter.bot_framework_authentication.create_user_token_client(
+        # The connector and user token clients are independent, so create them concurrently.
+        connector_client, user_token_client = await asyncio.gather(
+            connector_factory.create(
+                turn_context.activity.service_url, "https://api.botframework.com"
+            ),
+            adapter.bot_framework_authentication.create_user_token_client(
                 claims_identity
-            )
+            ),
         )
 
         async def logic(context: TurnContext):
@@ -203,10 +204,12 @@ class MagenticBot(ActivityHandler):
 
     async def process_magentic_chat(self, magentic_chat: MagenticOneGroupChat, text: str, turn_context: TurnContext, chat_ctx: ChatContext):
         last_result = None
+        conversation_id = turn_context.activity.conversation.id
+        conversation_reference = turn_context.activity.get_conversation_reference()
         stream = magentic_chat.run_stream(task=text, cancellation_token=CancellationToken())
-        logger.info(f"Processing Magentic chat for conversation {turn_context.activity.conversation.id}")
+        logger.info(f"Processing Magentic chat for conversation {conversation_id}")
         async for message in stream:
-            logger.info(f"received message: {message}")
+            logger.debug("received message: %s", message)
             if isinstance(message, (ToolCallRequestEvent,
                                     ToolCallExecutionEvent, MemoryQueryEvent, UserInputRequestedEvent, ModelClientStreamingChunkEvent, ThoughtEvent)):
                 continue
@@ -225,18 +228,14 @@ class MagenticBot(ActivityHandler):
                 if agent_name == "MagenticOneOrchestrator":
                     agent_name = self.name
                     logger.info("MagenticOneOrchestrator agent name")
-                context = await self.get_bot_context(
-                    turn_context.activity.conversation.id, agent_name, turn_context
-                )
+                context = await self.get_bot_context(conversation_id, agent_name, turn_context)
                 if message.content.strip() == "":
                     continue
 
                 chat_ctx.chat_history.add_assistant_message(message.content, name=agent_name)
 
                 activity = MessageFactory.text(message.content)
-                activity.apply_conversation_reference(
-                    turn_context.activity.get_conversation_reference()
-                )
+                activity.apply_conversation_reference(conversation_reference)
                 context.activity = activity
                 if self.include_monologue:
                     await context.send_activity(activity)
@@ -1,9 +1,13 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
 
+import atexit
+import functools
 import json
 import logging
 import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from azure.monitor.opentelemetry import configure_azure_monitor
 from opentelemetry import trace
 from opentelemetry.sdk.trace import TracerProvider
@@ -13,14 +17,29 @@ from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from opentelemetry.instrumentation.logging import LoggingInstrumentor
 import yaml
 
+try:
+    # Use the libyaml-backed loader when PyYAML was built with it.
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
 logger = logging.getLogger(__name__)
 formatter = logging.Formatter(
     "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 
+# Logging and telemetry are process-wide; repeated setup calls would stack duplicate handlers and exporters.
+_logging_configured = False
+_app_insights_configured = False
+
 
 def setup_app_insights_logging(credential, log_level=logging.DEBUG) -> None:
     """Configure OpenTelemetry logging and tracing for Application Insights."""
+    global _app_insights_configured
+    if _app_insights_configured:
+        return
+    _app_insights_configured = True
+
     os.environ["OTEL_EXPERIMENTAL_RESOURCE_DETECTORS"] = "azure_app_service"
     trace.set_tracer_provider(TracerProvider())
     tracer_provider = trace.get_tracer_provider()
@@ -59,6 +78,11 @@ def setup_app_insights_logging(credential, log_level=logging.DEBUG) -> None:
 
 
 def setup_logging(log_level=logging.DEBUG) -> None:
+    global _logging_configured
+    if _logging_configured:
+        return
+    _logging_configured = True
+
     # Create a logging handler to write logging records, in OTLP format, to the exporter.
     console_handler = logging.StreamHandler()
 
@@ -66,19 +90,33 @@ def setup_logging(log_level=logging.DEBUG) -> None:
     # console_handler.addFilter(logging.Filter("semantic_kernel"))
     console_handler.setFormatter(formatter)
 
+    # Write console output on a background thread so logging calls on the event loop never block on stream I/O.
+    log_queue = queue.SimpleQueue()
+    queue_listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+    queue_listener.start()
+    atexit.register(queue_listener.stop)
+
     logger = logging.getLogger()
-    logger.addHandler(console_handler)
+    logger.addHandler(QueueHandler(log_queue))
     logger.setLevel(log_level)
 
 
-def load_agent_config(scenario: str) -> dict:
+@functools.lru_cache(maxsize=32)
+def read_instructions_file(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=8)
+def load_agent_config(scenario: str) -> list[dict]:
+    """ Loads the agent configuration for a scenario. The result is cached and shared, so callers must not mutate it. """
     src_dir = os.path.dirname(os.path.abspath(__file__))
     scenario_directory = os.path.join(src_dir, f"scenarios/{scenario}/config")
 
     agent_config_path = os.path.join(scenario_directory, "agents.yaml")
 
     with open(agent_config_path, "r", encoding="utf-8") as f:
-        agent_config = yaml.safe_load(f)
+        agent_config = yaml.load(f, Loader=YamlLoader)
     bot_ids = json.loads(os.getenv("BOT_IDS"))
     hls_model_endpoints = json.loads(os.getenv("HLS_MODEL_ENDPOINTS"))
     for agent in agent_config:
@@ -86,8 +124,7 @@ def load_agent_config(scenario: str) -> dict:
         agent["hls_model_endpoint"] = hls_model_endpoints
         if agent.get("addition_instructions"):
             for file in agent["addition_instructions"]:
-                with open(os.path.join(scenario_directory, file)) as f:
-                    agent["instructions"] += f.read()
+                agent["instructions"] += read_instructions_file(os.path.join(scenario_directory, file))
 
     return agent_config
 
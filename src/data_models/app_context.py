@@ -2,6 +2,7 @@
 # Licensed under the MIT License.
 
 from dataclasses import dataclass
+from functools import cached_property
 from typing import Any, Callable, Coroutine
 
 from azure.core.credentials_async import AsyncTokenCredential
@@ -19,6 +20,11 @@ class AppContext:
     credential: AsyncTokenCredential
     data_access: DataAccess
 
+    @cached_property
+    def agent_configs_by_name(self) -> dict[str, dict]:
+        """ Index of agent configurations by agent name. """
+        return {agent_config["name"]: agent_config for agent_config in self.all_agent_configs}
+
     @property
     def azureml_token_provider(self) -> Callable[[], Coroutine[Any, Any, str]]:
         return get_bearer_token_provider(self.credential, "https://ml.azure.com/.default")
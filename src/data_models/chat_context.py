@@ -5,6 +5,8 @@ import os
 
 from semantic_kernel.contents.chat_history import ChatHistory
 
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 
 class ChatContext:
     def __init__(self, conversation_id: str):
@@ -16,5 +18,5 @@ class ChatContext:
         self.display_image_urls = []
         self.display_clinical_trials = []
         self.output_data = []
-        self.root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.root_dir = _ROOT_DIR
         self.healthcare_agents = {}
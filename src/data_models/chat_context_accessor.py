@@ -14,6 +14,9 @@ from data_models.chat_context import ChatContext
 
 logger = logging.getLogger(__name__)
 
+# json.dumps builds a new encoder on every call when options are given, so one is created up front.
+_chat_context_encoder = json.JSONEncoder(indent=2)
+
 
 class ChatContextAccessor:
     """
@@ -90,7 +93,7 @@ class ChatContextAccessor:
     @staticmethod
     def serialize(chat_ctx: ChatContext) -> str:
         """Serialize the chat context to a string."""
-        return json.dumps(
+        return _chat_context_encoder.encode(
             {
                 "conversation_id": chat_ctx.conversation_id,
                 "chat_history": chat_ctx.chat_history.serialize(),
@@ -100,8 +103,7 @@ class ChatContextAccessor:
                 "display_clinical_trials": chat_ctx.display_clinical_trials,
                 "output_data": chat_ctx.output_data,
                 "healthcare_agents": chat_ctx.healthcare_agents,
-            },
-            indent=2,
+            }
         )
 
     @staticmethod
@@ -0,0 +1,55 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import asyncio
+import logging
+from typing import Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class ClientSessionProvider:
+    """
+    Provides an HTTP session that is shared by all requests of an accessor, so connections are kept alive
+    and reused. An aiohttp session is bound to the event loop it was created on, so a new session is created
+    when the running loop changes and the previous one is closed on its own loop.
+    """
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """ Returns the shared session for the running event loop, creating it if needed. """
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._session_loop is not loop:
+            self._discard_stale_session()
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+            self._session_loop = loop
+        return self._session
+
+    def _discard_stale_session(self) -> None:
+        """ Closes a session created on another event loop, or drops it if that loop is gone. """
+        stale_session, stale_loop = self._session, self._session_loop
+        self._session = None
+        self._session_loop = None
+        if stale_loop is not None and stale_loop.is_running():
+            asyncio.run_coroutine_threadsafe(stale_session.close(), stale_loop)
+        else:
+            # The loop that owned the session has stopped, so its connections cannot be closed anymore.
+            logger.debug("Discarding HTTP session bound to a stopped event loop.")
+
+    async def close(self) -> None:
+        """ Closes the shared session. """
+        session, session_loop = self._session, self._session_loop
+        self._session = None
+        self._session_loop = None
+        if session is None or session.closed:
+            return
+        if session_loop is asyncio.get_running_loop():
+            await session.close()
+        elif session_loop is not None and session_loop.is_running():
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), session_loop))
@@ -21,6 +21,9 @@ class ClinicalNoteAccessor:
         self.container_client = self.blob_service_client.get_container_client(self.container_name)
         self.folder_name = folder_name
 
+    async def close(self) -> None:
+        """Nothing to close; the blob service client is owned by the application."""
+
     async def get_patients(self) -> list[str]:
         """Get the list of patients."""
         start = time()
@@ -62,17 +65,15 @@ class ClinicalNoteAccessor:
         try:
             blob_path = f"{patient_id}/{self.folder_name}/"
             blob_names = [name async for name in self.container_client.list_blob_names(name_starts_with=blob_path)]
-            batch_size = 10
 
-            # Read blobs in batches
-            notes = []
-            for i in range(0, len(blob_names), batch_size):
-                batch_input = blob_names[i:i + batch_size]
-                batch = [self._read_blob(note_id) for note_id in batch_input]
-                batch_results = await asyncio.gather(*batch)
-                notes.extend(batch_results)
+            # Keep up to 10 blob reads in flight, starting the next one as soon as any finishes
+            semaphore = asyncio.Semaphore(10)
+
+            async def read_blob(blob_name: str) -> str:
+                async with semaphore:
+                    return await self._read_blob(blob_name)
 
-            return notes
+            return await asyncio.gather(*(read_blob(blob_name) for blob_name in blob_names))
         finally:
             logger.info(f"Read all clinical notes for {patient_id}. Duration: {time() - start}s")
 
@@ -16,6 +16,7 @@ from data_models.clinical_note_accessor import ClinicalNoteAccessor
 from data_models.fabric.fabric_clinical_note_accessor import FabricClinicalNoteAccessor
 from data_models.fhir.fhir_clinical_note_accessor import FhirClinicalNoteAccessor
 from data_models.image_accessor import ImageAccessor
+from data_models.loop_bound_lock import LoopBoundLock
 
 logger = logging.getLogger(__name__)
 
@@ -23,17 +24,21 @@ class UserDelegationKeyDelegate:
     def __init__(self, blob_service_client: BlobServiceClient):
         self.blob_service_client = blob_service_client
         self.user_delegation_key = None
+        # Serializes refreshes so concurrent SAS requests share a single key request.
+        self._refresh_lock = LoopBoundLock()
 
     async def get_user_delegation_key(self) -> UserDelegationKey:
         if self.is_expired():
-            now_utc = datetime.datetime.now(datetime.UTC)
-            key_start_time = now_utc - datetime.timedelta(minutes=3)
-            key_expiry_time = key_start_time + datetime.timedelta(hours=1)
+            async with self._refresh_lock.get():
+                if self.is_expired():
+                    now_utc = datetime.datetime.now(datetime.UTC)
+                    key_start_time = now_utc - datetime.timedelta(minutes=3)
+                    key_expiry_time = key_start_time + datetime.timedelta(hours=1)
 
-            self.user_delegation_key = await self.blob_service_client.get_user_delegation_key(
-                key_start_time=key_start_time,
-                key_expiry_time=key_expiry_time
-            )
+                    self.user_delegation_key = await self.blob_service_client.get_user_delegation_key(
+                        key_start_time=key_start_time,
+                        key_expiry_time=key_expiry_time
+                    )
 
         return self.user_delegation_key
 
@@ -88,6 +93,10 @@ class DataAccess:
     clinical_note_accessor: ClinicalNoteAccessor
     image_accessor: ImageAccessor
 
+    async def close(self) -> None:
+        """ Releases the resources held by the data accessors. """
+        await self.clinical_note_accessor.close()
+
 
 def create_data_access(
     blob_service_client: BlobServiceClient,
@@ -4,17 +4,24 @@
 import asyncio
 import logging
 from typing import Any, Callable, Coroutine, List, Optional, Tuple
-import json
-import base64
+import pybase64
 from datetime import date, timedelta
 
 import re
 import aiohttp
+import orjson
 from azure.core.credentials_async import AsyncTokenCredential
 from azure.identity.aio import get_bearer_token_provider
 
+from data_models.client_session_provider import ClientSessionProvider
+
 logger = logging.getLogger(__name__)
 
+FABRIC_ENDPOINT_PATTERNS = [
+    re.compile(r"/workspaces/([^/]+)/userDataFunctions/([^/]+)", re.IGNORECASE),
+    re.compile(r"/groups/([^/]+)/userdatafunctions/([^/]+)", re.IGNORECASE),
+]
+
 class FabricClinicalNoteAccessor:
     def __init__(
         self,
@@ -25,6 +32,7 @@ class FabricClinicalNoteAccessor:
         workspace_id, data_function_id = self.__parse_fabric_endpoint(fabric_user_data_function_endpoint)
         self.api_endpoint = f"https://api.fabric.microsoft.com/v1/workspaces/{workspace_id}/userDataFunctions/{data_function_id}"
         self.bearer_token_provider = bearer_token_provider
+        self._session_provider = ClientSessionProvider()
 
     def __parse_fabric_endpoint(self, url: str) -> Optional[Tuple[str, str]]:
         """
@@ -39,12 +47,8 @@ class FabricClinicalNoteAccessor:
         :return: Tuple of (workspace_id, data_function_id) if found, else None.
         """
         # Try both possible patterns (case-insensitive for 'userdatafunctions')
-        patterns = [
-            r"/workspaces/([^/]+)/userDataFunctions/([^/]+)",
-            r"/groups/([^/]+)/userdatafunctions/([^/]+)"
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, url, re.IGNORECASE)
+        for pattern in FABRIC_ENDPOINT_PATTERNS:
+            match = pattern.search(url)
             if match:
                 workspace_id, data_function_id = match.groups()
                 return workspace_id, data_function_id
@@ -56,6 +60,14 @@ class FabricClinicalNoteAccessor:
         token_provider = get_bearer_token_provider(credential, f"https://analysis.windows.net/powerbi/api")
         return FabricClinicalNoteAccessor(fabric_user_data_function_endpoint, token_provider)
 
+    def get_session(self) -> aiohttp.ClientSession:
+        """ Returns the HTTP session shared by all requests of this accessor. """
+        return self._session_provider.get_session()
+
+    async def close(self) -> None:
+        """ Closes the shared HTTP session. """
+        await self._session_provider.close()
+
     async def get_headers(self) -> dict:
         """
         Returns the headers required for Fabric API requests.
@@ -71,22 +83,20 @@ class FabricClinicalNoteAccessor:
         """Get the list of patients."""
         target_endpoint = f"{self.api_endpoint}/functions/get_patients_by_id/invoke"
         headers = await self.get_headers()
-        async with aiohttp.ClientSession() as session:
-            async with session.post(target_endpoint, json={}, headers=headers) as response:
-                response.raise_for_status()
-                content = await response.content.read()
-                data = json.loads(content.decode('utf-8'))
+        async with self.get_session().post(target_endpoint, json={}, headers=headers) as response:
+            response.raise_for_status()
+            content = await response.content.read()
+            data = orjson.loads(content)
         return data['output']['ids']
 
     async def get_metadata_list(self, patient_id: str) -> list[dict[str, str]]:
         """Get the clinical note URLs for a given patient ID."""
         target_endpoint = f"{self.api_endpoint}/functions/get_clinical_notes_by_patient_id/invoke"
         headers = await self.get_headers()
-        async with aiohttp.ClientSession() as session:
-            async with session.post(target_endpoint, json={"patientId": patient_id}, headers=headers) as response:
-                response.raise_for_status()
-                content = await response.content.read()
-                data = json.loads(content.decode('utf-8'))
+        async with self.get_session().post(target_endpoint, json={"patientId": patient_id}, headers=headers) as response:
+            response.raise_for_status()
+            content = await response.content.read()
+            data = orjson.loads(content)
         document_reference_ids = data['output']
 
         return [
@@ -100,23 +110,31 @@ class FabricClinicalNoteAccessor:
         """Read the clinical note for a given patient ID and note ID."""
         target_endpoint = f"{self.api_endpoint}/functions/get_clinical_note_by_patient_id/invoke"
         headers = await self.get_headers()
-        async with aiohttp.ClientSession() as session:
-            async with session.post(target_endpoint, json={"noteId": note_id}, headers=headers) as response:
-                response.raise_for_status()
-                content = await response.content.read()
-                data = json.loads(content.decode('utf-8'))
+        async with self.get_session().post(target_endpoint, json={"noteId": note_id}, headers=headers) as response:
+            response.raise_for_status()
+            content = await response.content.read()
+
+        # Parsing and decoding are CPU bound and grow with note size, so they run off the event loop.
+        return await asyncio.to_thread(self.parse_note, content, note_id)
+
+    @staticmethod
+    def parse_note(content: bytes, note_id: str) -> str:
+        """Decode the clinical note from a get_clinical_note_by_patient_id response body."""
+        data = orjson.loads(content)
         document_reference = data["output"]
         document_reference_data = document_reference["content"][0]["attachment"]["data"]
 
-        note_content = base64.b64decode(document_reference_data).decode("utf-8")
+        # orjson parses the decoded bytes directly; text is only needed for non-JSON notes
+        note_bytes = pybase64.b64decode(document_reference_data)
 
         note_json = {}
         try:
-            note_json = json.loads(note_content)
+            note_json = orjson.loads(note_bytes)
             note_json['id'] = note_id
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
 
             # Try to handle note content that is not JSON
+            note_content = note_bytes.decode("utf-8")
             if note_content:
                 target_date = date.today() - timedelta(days=30)
                 target_date.isoformat()
@@ -127,7 +145,7 @@ class FabricClinicalNoteAccessor:
                     "type": "clinical note",
                 }
 
-        return json.dumps(note_json)
+        return orjson.dumps(note_json).decode("utf-8")
 
     async def read_all(self, patient_id: str) -> List[str]:
         """
@@ -138,11 +156,11 @@ class FabricClinicalNoteAccessor:
         """
         metadata_list = await self.get_metadata_list(patient_id)
 
-        notes = []
-        batch_size = 10
-        for i in range(0, len(metadata_list), batch_size):
-            batch_input = metadata_list[i:i + batch_size]
-            batch = [self.read(patient_id, note["id"]) for note in batch_input]
-            batch_results = await asyncio.gather(*batch)
-            notes.extend(batch_results)
-        return notes
\ No newline at end of file
+        # Keep up to 10 reads in flight, starting the next one as soon as any finishes
+        semaphore = asyncio.Semaphore(10)
+
+        async def read_note(note_id: str) -> str:
+            async with semaphore:
+                return await self.read(patient_id, note_id)
+
+        return await asyncio.gather(*(read_note(note["id"]) for note in metadata_list))
\ No newline at end of file
@@ -2,18 +2,25 @@
 # Licensed under the MIT license.
 
 import asyncio
-import base64
-import json
 import logging
-from typing import Any, Callable, Coroutine, Dict, List
+import time
+from typing import Any, Callable, Coroutine, Dict, List, Optional
 
 import aiohttp
+import orjson
+import pybase64
 from azure.core.credentials_async import AsyncTokenCredential
-from azure.identity.aio import get_bearer_token_provider
+from azure.identity.aio import ClientSecretCredential, get_bearer_token_provider
 import urllib
 
+from data_models.client_session_provider import ClientSessionProvider
+from data_models.loop_bound_lock import LoopBoundLock
+
 logger = logging.getLogger(__name__)
 
+# The patient list rarely changes, so the name to id map is reused for a short time.
+PATIENT_ID_MAP_TTL_SECONDS = 300
+
 
 class FhirClinicalNoteAccessor:
 
@@ -26,22 +33,12 @@ class FhirClinicalNoteAccessor:
     @staticmethod
     def from_client_secret(tenant_id: str, client_id: str, client_secret: str, fhir_url: str) -> 'FhirClinicalNoteAccessor':
         """ Creates an instance of FhirClinicalNoteAccessor using client secret."""
-        async def bearer_token_provider() -> str:
-            token_url = f"https://login.microsoftonline.com/{tenant_id}/oauth2/token"
-            headers = {"Content-Type": "application/x-www-form-urlencoded"}
-            data = {
-                "grant_type": "client_credentials",
-                "resource": fhir_url,
-                "client_id": client_id,
-                "client_secret": client_secret,
-                "scope": f"{fhir_url}/.default"
-            }
-            async with aiohttp.request('POST', token_url, data=data, headers=headers) as resp:
-                resp.raise_for_status()
-                json_response = await resp.json()
-                return json_response["access_token"]
-
-        return FhirClinicalNoteAccessor(fhir_url, bearer_token_provider)
+        # The credential caches tokens and refreshes them before they expire.
+        credential = ClientSecretCredential(tenant_id, client_id, client_secret)
+        accessor = FhirClinicalNoteAccessor.from_credential(fhir_url, credential)
+        # The credential was created here, so it is closed together with the accessor.
+        accessor._owned_credential = credential
+        return accessor
 
     def __init__(self, fhir_url: str, bearer_token_provider: Callable[[], Coroutine[Any, Any, str]]):
         """
@@ -57,6 +54,22 @@ class FhirClinicalNoteAccessor:
 
         self.fhir_url = fhir_url
         self.bearer_token_provider = bearer_token_provider
+        self._session_provider = ClientSessionProvider()
+        self._owned_credential: Optional[AsyncTokenCredential] = None
+        self._patient_id_map: Optional[Dict[str, str]] = None
+        self._patient_id_map_expiry = 0.0
+        self._patient_id_map_lock = LoopBoundLock()
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """ Returns the HTTP session shared by all requests of this accessor. """
+        return self._session_provider.get_session()
+
+    async def close(self) -> None:
+        """ Closes the shared HTTP session and the credential owned by this accessor, if any. """
+        await self._session_provider.close()
+        if self._owned_credential is not None:
+            await self._owned_credential.close()
+            self._owned_credential = None
 
     async def get_headers(self) -> dict:
         """
@@ -94,23 +107,23 @@ class FhirClinicalNoteAccessor:
         entries = []
         url = base_url
         parsed_url = urllib.parse.urlparse(url)
-        async with aiohttp.ClientSession() as session:
-            while url and len(entries) < result_count_limit:
-                logger.debug(f"Fetching from URL: {url}")
-                async with session.get(url, headers=await self.get_headers()) as response:
-                    response.raise_for_status()
-                    response_json = await response.json()
-            
-                new_entries = extract_entries(response_json)
-                entries.extend(new_entries)
-                if len(entries) >= result_count_limit:
-                    break
-                token = extract_continuation_token(response_json)
-                if token:
-                    # Append or replace query string with continuation token
-                    url = f"{parsed_url.scheme}://{parsed_url.netloc}{parsed_url.path}?{token}"
-                else:
-                    url = None
+        session = self.get_session()
+        while url and len(entries) < result_count_limit:
+            logger.debug("Fetching from URL: %s", url)
+            async with session.get(url, headers=await self.get_headers()) as response:
+                response.raise_for_status()
+                response_json = orjson.loads(await response.read())
+
+            new_entries = extract_entries(response_json)
+            entries.extend(new_entries)
+            if len(entries) >= result_count_limit:
+                break
+            token = extract_continuation_token(response_json)
+            if token:
+                # Append or replace query string with continuation token
+                url = f"{parsed_url.scheme}://{parsed_url.netloc}{parsed_url.path}?{token}"
+            else:
+                url = None
         return entries[:result_count_limit]
 
     async def get_patients(self) -> List[str]:
@@ -125,18 +138,26 @@ class FhirClinicalNoteAccessor:
         )
         return [entry["resource"]['name'][0]['given'][0] for entry in entries]
 
-    async def get_patient_id_map(self) -> List[str]:
+    async def get_patient_id_map(self) -> Dict[str, str]:
         """
-        Retrieves a list of patient IDs from the FHIR server.
+        Retrieves a map of patient names to patient IDs from the FHIR server.
+        The map is cached for PATIENT_ID_MAP_TTL_SECONDS.
 
-        :return: A list of patient IDs.
+        :return: A dictionary of patient names to patient IDs.
         """
-        entries = await self.fetch_all_entries(
-            base_url=f"{self.fhir_url}/Patient",
-            result_count_limit=100
-        )
+        async with self._patient_id_map_lock.get():
+            if self._patient_id_map is not None and time.monotonic() < self._patient_id_map_expiry:
+                return self._patient_id_map
+
+            entries = await self.fetch_all_entries(
+                base_url=f"{self.fhir_url}/Patient",
+                result_count_limit=100
+            )
 
-        return {entry["resource"]['name'][0]['given'][0]: entry["resource"]['id'] for entry in entries}
+            self._patient_id_map = {
+                entry["resource"]['name'][0]['given'][0]: entry["resource"]['id'] for entry in entries}
+            self._patient_id_map_expiry = time.monotonic() + PATIENT_ID_MAP_TTL_SECONDS
+            return self._patient_id_map
 
     async def get_metadata_list(self, patient_id: str) -> List[Dict[str, str]]:
         """
@@ -152,19 +173,22 @@ class FhirClinicalNoteAccessor:
             base_url=f"{self.fhir_url}/DocumentReference?subject=Patient/{patient_id}&_elements=subject,id",
             result_count_limit=100
         )
+        # Match the subject reference exactly, either relative or as an absolute URL
+        target_reference = f"Patient/{patient_id}"
+        absolute_reference_suffix = f"/{target_reference}"
         entries = []
         for document_reference in document_references:
-            if "resource" not in document_reference:
+            resource = document_reference.get("resource")
+            if resource is None:
                 continue
-            if "subject" not in document_reference["resource"]:
+            reference = resource.get("subject", {}).get("reference")
+            if reference is None:
                 continue
-            if "reference" not in document_reference["resource"]["subject"]:
-                continue
-            if patient_id not in document_reference["resource"]["subject"]["reference"]:
+            if reference != target_reference and not reference.endswith(absolute_reference_suffix):
                 continue
             entries.append({
-                "id": document_reference["resource"]["id"],
-                "type": document_reference["resource"]["type"]["text"] if "type" in document_reference["resource"] else "clinical note",
+                "id": resource["id"],
+                "type": resource["type"]["text"] if "type" in resource else "clinical note",
             })
         return entries
 
@@ -178,17 +202,74 @@ class FhirClinicalNoteAccessor:
         """
         url = f"{self.fhir_url}/DocumentReference/{note_id}"
         headers = await self.get_headers()
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                response.raise_for_status()
-                document_reference = await response.json()
+        async with self.get_session().get(url, headers=headers) as response:
+            response.raise_for_status()
+            document_reference = orjson.loads(await response.read())
+
+        return await asyncio.to_thread(self.parse_note, document_reference, note_id)
+
+    @staticmethod
+    def parse_note(document_reference: dict, note_id: str) -> str:
+        """
+        Decodes the clinical note attached to a DocumentReference resource.
+
+        :param document_reference: The DocumentReference resource.
+        :param note_id: The ID of the clinical note.
+        :return: The content of the clinical note.
+        """
         note_content = document_reference["content"][0]["attachment"]["data"]
 
-        note_json = json.loads(base64.b64decode(note_content).decode("utf-8"))
+        note_json = orjson.loads(pybase64.b64decode(note_content))
 
         note_json['id'] = note_id
 
-        return json.dumps(note_json)
+        return orjson.dumps(note_json).decode("utf-8")
+
+    @staticmethod
+    def parse_notes(document_references: List[Optional[dict]], note_ids: List[str]) -> List[Optional[str]]:
+        """
+        Decodes the clinical notes of several DocumentReference resources.
+
+        :param document_references: The DocumentReference resources, with None for missing ones.
+        :param note_ids: The IDs of the clinical notes.
+        :return: The note contents, with None where the resource is missing.
+        """
+        return [
+            None if document_reference is None else FhirClinicalNoteAccessor.parse_note(document_reference, note_id)
+            for document_reference, note_id in zip(document_references, note_ids)
+        ]
+
+    async def read_batch(self, note_ids: List[str]) -> Optional[List[Optional[dict]]]:
+        """
+        Retrieves several DocumentReference resources with a single FHIR batch request.
+
+        :param note_ids: The IDs of the clinical notes.
+        :return: The resources in the order of note_ids, with None for entries that failed,
+                 or None if the server did not accept the batch.
+        """
+        bundle = {
+            "resourceType": "Bundle",
+            "type": "batch",
+            "entry": [
+                {"request": {"method": "GET", "url": f"DocumentReference/{note_id}"}} for note_id in note_ids
+            ],
+        }
+        headers = await self.get_headers()
+        async with self.get_session().post(self.fhir_url, json=bundle, headers=headers) as response:
+            if response.status != 200:
+                logger.warning("FHIR batch request failed with status %s, reading notes one by one.", response.status)
+                return None
+            response_bundle = orjson.loads(await response.read())
+
+        entries = response_bundle.get("entry", [])
+        if response_bundle.get("type") != "batch-response" or len(entries) != len(note_ids):
+            logger.warning("Unexpected FHIR batch response, reading notes one by one.")
+            return None
+
+        return [
+            entry.get("resource") if entry.get("response", {}).get("status", "").startswith("200") else None
+            for entry in entries
+        ]
 
     async def read_all(self, patient_id: str) -> List[str]:
         """
@@ -198,12 +279,25 @@ class FhirClinicalNoteAccessor:
         :return: A list of clinical note contents.
         """
         metadata_list = await self.get_metadata_list(patient_id)
+        if not metadata_list:
+            return []
+
+        # Fetch all notes in one batch request. Notes the batch could not return are read individually.
+        note_ids = [note["id"] for note in metadata_list]
+        document_references = await self.read_batch(note_ids) or [None] * len(note_ids)
+
+        # Decoding is CPU bound and grows with note size, so it runs off the event loop.
+        notes = await asyncio.to_thread(self.parse_notes, document_references, note_ids)
+        missing = [i for i, note in enumerate(notes) if note is None]
+
+        # Keep up to 10 reads in flight, starting the next one as soon as any finishes
+        semaphore = asyncio.Semaphore(10)
+
+        async def read_note(note_id: str) -> str:
+            async with semaphore:
+                return await self.read(patient_id, note_id)
 
-        notes = []
-        batch_size = 10
-        for i in range(0, len(metadata_list), batch_size):
-            batch_input = metadata_list[i:i + batch_size]
-            batch = [self.read(patient_id, note["id"]) for note in batch_input]
-            batch_results = await asyncio.gather(*batch)
-            notes.extend(batch_results)
+        missing_notes = await asyncio.gather(*(read_note(note_ids[index]) for index in missing))
+        for index, note in zip(missing, missing_notes):
+            notes[index] = note
         return notes
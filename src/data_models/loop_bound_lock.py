@@ -0,0 +1,24 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import asyncio
+from typing import Optional
+
+
+class LoopBoundLock:
+    """
+    An asyncio lock that is created lazily for the running event loop. An asyncio.Lock binds to the first
+    loop that waits on it, so a new lock is created when the running loop changes.
+    """
+
+    def __init__(self):
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get(self) -> asyncio.Lock:
+        """ Returns the lock for the running event loop. """
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
@@ -201,21 +201,26 @@ def create_group_chat(
     agents = [_create_agent(agent) for agent in all_agents_config]
 
     def evaluate_termination(result):
-        logger.info(f"Termination function result: {result}")
+        logger.info("Termination function result: %s", result)
         rule = ChatRule.model_validate_json(str(result.value[0]))
         return rule.verdict == "yes"
 
+    agent_names = {agent["name"] for agent in all_agents_config}
+
     def evaluate_selection(result):
-        logger.info(f"Selection function result: {result}")
+        logger.info("Selection function result: %s", result)
         rule = ChatRule.model_validate_json(str(result.value[0]))
-        return rule.verdict if rule.verdict in [agent["name"] for agent in all_agents_config] else facilitator
+        return rule.verdict if rule.verdict in agent_names else facilitator
+
+    # Selection and termination only run prompt functions and register no plugins, so they can share a kernel.
+    strategy_kernel = _create_kernel_with_chat_completion()
 
     chat = AgentGroupChat(
         agents=agents,
         chat_history=chat_ctx.chat_history,
         selection_strategy=KernelFunctionSelectionStrategy(
             function=selection_function,
-            kernel=_create_kernel_with_chat_completion(),
+            kernel=strategy_kernel,
             result_parser=evaluate_selection,
             agent_variable_name="agents",
             history_variable_name="history",
@@ -226,7 +231,7 @@ def create_group_chat(
                 agent for agent in agents if agent.name == facilitator
             ],  # Only facilitator decides if the conversation ends
             function=termination_function,
-            kernel=_create_kernel_with_chat_completion(),
+            kernel=strategy_kernel,
             result_parser=evaluate_termination,
             agent_variable_name="agents",
             history_variable_name="history",
@@ -36,6 +36,9 @@ def create_fast_mcp_app(app_ctx: AppContext) -> Starlette:
                 yield
             finally:
                 logger.info("Application shutting down, cleaning up resources...")
+                # Close the accessors before cancelling the task group, which would interrupt the close.
+                with anyio.CancelScope(shield=True):
+                    await data_access.close()
                 if task_group:
                     tg.cancel_scope.cancel()
                     task_group = None
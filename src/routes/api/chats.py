@@ -130,7 +130,7 @@ def chats_routes(app_context: AppContext):
             # Process the message - determine target agent based on mentions
             target_agent_name = facilitator  # Default to facilitator agent
             
-            if mentions and len(mentions) > 0:
+            if mentions:
                 # Use the first mentioned agent
                 target_agent_name = mentions[0]
 
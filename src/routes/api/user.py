@@ -70,7 +70,7 @@ def get_user_info_from_headers(request: Request) -> Dict:
                 
                 for claim_type in email_claims:
                     claim_values = claims_identity.claims.get(claim_type)
-                    if claim_values and len(claim_values) > 0:
+                    if claim_values:
                         email = claim_values[0]
                         if email:
                             break
@@ -78,7 +78,7 @@ def get_user_info_from_headers(request: Request) -> Dict:
                 # If we still don't have an email, try the name claim if it looks like an email
                 if not email:
                     name_claims = claims_identity.claims.get("http://schemas.xmlsoap.org/ws/2005/05/identity/claims/name")
-                    if name_claims and len(name_claims) > 0 and '@' in name_claims[0]:
+                    if name_claims and '@' in name_claims[0]:
                         email = name_claims[0]
                 
                 # Extract roles